@@ -1,14 +1,41 @@
+import asyncio
+import math
 import os
 import pickle
+import sqlite3
+import threading
 import time
-from folium.plugins import MarkerCluster
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from folium.plugins import FastMarkerCluster, HeatMap, MarkerCluster
 from geopy.geocoders import Nominatim
 from tqdm import tqdm
 import folium
+import matplotlib
+matplotlib.use('Agg')  # headless: render ke PNG, tanpa GUI toolkit/event loop
+import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import pygeohash
 
+try:
+    from numba import njit, prange
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+try:
+    import aiohttp
+    HAS_AIOHTTP = True
+except ImportError:
+    HAS_AIOHTTP = False
+
+try:
+    import pyarrow.parquet as pa_parquet
+    STR_DTYPE = 'string[pyarrow]'  # hash/unique/isin via kernel Arrow
+except ImportError:
+    pa_parquet = None
+    STR_DTYPE = 'string'
+
 def assign_geohash_id(df, precision=5):
     def safe_encode(row):
         try:
@@ -26,68 +53,204 @@ def assign_geohash_id(df, precision=5):
 GS_PATH = "Data Excel GS Feb 25.xlsx"
 GS_SHEET = "threatcast bni Hardware Febuary"
 ONBOARD_PATH = "export_detail.xlsx"
-REGION_CACHE_PATH = "region_cache.pkl"
+# Hanya kolom yang dipakai pipeline; sisanya tidak usah di-parse/alokasi
+GS_COLS = ['app_user_id', 'reasons_for_detection', 'device', 'os_version']
+ONBOARD_COLS = [
+    'DEVICE_ID', 'CIF', 'LATITUDE', 'LONGITUDE', 'CREATED_TIME',
+    'MESSAGE_ORIGIN', 'SCENARIO', 'PROVISIONING_NIK_LOG',
+    'TEMPORARY_USER_STATUS', 'Region',
+]
+REGION_CACHE_PATH = "region_cache.pkl"   # cache pickle lama, dimigrasi sekali
+REGION_CACHE_DB = "region_cache.db"
+CACHE_DEC = 2  # presisi key cache (~1km); region hasil geocode memang kasar
 OUT_MAP = "risk_grid_map.html"
+OUT_HEATMAP = "risk_heatmap.html"
 OUT_GRID = "hasil_grid_agg.xlsx"
 OUT_DETAIL = "hasil_grid_detail.xlsx"
+OUT_RISK = "hasil_risk_cif.xlsx"
+OUT_CHART_COHORT = "cohort_analysis.png"
+OUT_CHART_REGION = "risk_region.png"
 GRID_DEC = 2   # grid presisi 0.01 derajat (sekitar 1km)
 MIN_RISK = 5   # min risk score dianggap high risk
+GEOCODE_WORKERS = 8        # thread untuk overlap latency HTTP
+GEOCODE_MIN_INTERVAL = 1.0 # Nominatim usage policy: max 1 request/detik
 
-def get_region(lat, lon, cache, delay=1):
-    
-    try:
-        lat = float(lat)
-        lon = float(lon)
-    except (ValueError, TypeError):
-        return "Unknown"
+class RateLimiter:
+    """Jaga jarak minimal antar request lintas semua worker thread."""
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next = 0.0
 
-    if pd.isnull(lat) or pd.isnull(lon) or lat == 0 or lon == 0:
-        return "Unknown"
+    def reserve(self):
+        """Klaim slot request berikutnya, return berapa detik harus menunggu."""
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.min_interval
+        return max(delay, 0.0)
 
-    key = (round(lat, 3), round(lon, 3))
-    if pd.isnull(lat) or pd.isnull(lon) or lat == 0 or lon == 0:
-        return "Unknown"
-    if key in cache:
-        return cache[key]
-    geolocator = Nominatim(user_agent="risk_grid_locator")
+    def wait(self):
+        time.sleep(self.reserve())
+
+_rate_limiter = RateLimiter(GEOCODE_MIN_INTERVAL)
+
+NOMINATIM_URL = "https://nominatim.openstreetmap.org/reverse"
+NOMINATIM_UA = "risk_grid_locator"
+
+def _parse_address(address):
+    return (
+        address.get('city') or address.get('town') or
+        address.get('county') or address.get('state') or
+        address.get('country')
+    ) or "Unknown"
+
+def get_region(lat, lon):
+    # Koordinat NaN/0 sudah dibuang vectorized di region_mapping,
+    # jadi di sini tinggal fetch murni.
+    _rate_limiter.wait()
+    geolocator = Nominatim(user_agent=NOMINATIM_UA)
     try:
         location = geolocator.reverse(f"{lat}, {lon}", language="id", timeout=5)
         if location and location.raw.get('address'):
-            address = location.raw['address']
-            region = (
-                address.get('city') or address.get('town') or
-                address.get('county') or address.get('state') or
-                address.get('country')
-            )
-            cache[key] = region
-            time.sleep(delay)
-            return region
-        else:
-            cache[key] = "Unknown"
-            return "Unknown"
+            return _parse_address(location.raw['address'])
+        return "Unknown"
     except Exception:
-        cache[key] = "Unknown"
         return "Unknown"
 
-def load_region_cache(path=REGION_CACHE_PATH):
-    if os.path.exists(path):
+async def _fetch_region_async(session, sem, lat, lon):
+    async with sem:
+        await asyncio.sleep(_rate_limiter.reserve())
+        params = {'lat': lat, 'lon': lon, 'format': 'jsonv2', 'accept-language': 'id'}
+        try:
+            async with session.get(NOMINATIM_URL, params=params,
+                                   timeout=aiohttp.ClientTimeout(total=5)) as resp:
+                js = await resp.json()
+                return _parse_address(js.get('address') or {})
+        except Exception:
+            return "Unknown"
+
+async def _geocode_async(todo):
+    sem = asyncio.Semaphore(GEOCODE_WORKERS)
+    async with aiohttp.ClientSession(headers={'User-Agent': NOMINATIM_UA}) as session:
+        tasks = [_fetch_region_async(session, sem, lat, lon) for lat, lon in todo]
+        results = await asyncio.gather(*tasks)
+    return dict(zip(todo, results))
+
+def _quantize(lat, lon):
+    scale = 10 ** CACHE_DEC
+    return int(round(lat * scale)), int(round(lon * scale))
+
+class RegionCache:
+    """Cache region persisten di SQLite.
+
+    Insert O(1) per koordinat baru (bukan rewrite seluruh dict seperti
+    pickle), dan hasil geocode selamat walau pipeline mati di tengah run.
+    """
+    def __init__(self, path=REGION_CACHE_DB):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS region_cache ("
+            "lat_q INTEGER, lon_q INTEGER, region TEXT, "
+            "PRIMARY KEY (lat_q, lon_q))"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        self._rescale()
+        self._migrate_pickle()
+        n = self.conn.execute("SELECT COUNT(*) FROM region_cache").fetchone()[0]
+        print(f"[INFO] Region cache loaded ({n} coords)")
+
+    def _rescale(self):
+        # Re-round key lama kalau presisi cache berubah antar versi
+        row = self.conn.execute("SELECT value FROM meta WHERE key='cache_dec'").fetchone()
+        old_dec = int(row[0]) if row else 3  # DB tanpa meta dibuat saat presisi masih 3
+        if old_dec != CACHE_DEC:
+            factor = 10 ** (old_dec - CACHE_DEC)
+            rows = self.conn.execute("SELECT lat_q, lon_q, region FROM region_cache").fetchall()
+            self.conn.execute("DELETE FROM region_cache")
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO region_cache VALUES (?, ?, ?)",
+                [(int(round(la / factor)), int(round(lo / factor)), r) for la, lo, r in rows]
+            )
+        self.conn.execute(
+            "INSERT OR REPLACE INTO meta VALUES ('cache_dec', ?)", (str(CACHE_DEC),)
+        )
+        self.conn.commit()
+
+    def _migrate_pickle(self, path=REGION_CACHE_PATH):
+        # Migrasi sekali jalan dari cache pickle lama, kalau DB masih kosong
+        if not os.path.exists(path):
+            return
+        empty = self.conn.execute("SELECT 1 FROM region_cache LIMIT 1").fetchone() is None
+        if not empty:
+            return
         with open(path, 'rb') as f:
-            cache = pickle.load(f)
-        print(f"[INFO] Region cache loaded ({len(cache)} coords)")
-    else:
-        cache = {}
-        print("[INFO] Region cache tidak ditemukan, akan dibuat baru.")
-    return cache
-
-def save_region_cache(cache, path=REGION_CACHE_PATH):
-    with open(path, 'wb') as f:
-        pickle.dump(cache, f)
-    print(f"[INFO] Region cache saved ({len(cache)} coords)")
+            old = pickle.load(f)
+        # Cache lama berisi key (nan, nan) dan region None; keduanya tidak
+        # berguna dipersist (nan tidak bisa di-quantize, None = cache miss)
+        valid = [
+            ((lat, lon), region) for (lat, lon), region in old.items()
+            if math.isfinite(lat) and math.isfinite(lon) and region is not None
+        ]
+        self.put_many(valid)
+        print(f"[INFO] Region cache dimigrasi dari pickle ({len(valid)} dari {len(old)} coords)")
+
+    def get(self, key):
+        row = self.conn.execute(
+            "SELECT region FROM region_cache WHERE lat_q=? AND lon_q=?",
+            _quantize(*key)
+        ).fetchone()
+        return row[0] if row else None
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def put_many(self, items):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO region_cache VALUES (?, ?, ?)",
+            [(*_quantize(lat, lon), region) for (lat, lon), region in items]
+        )
+        self.conn.commit()
+
+def _cached_read(path, sheet_name=0, usecols=None):
+    """Baca Excel lewat cache Parquet di sebelah file aslinya.
+
+    Parser xlsx (openpyxl) membangun seluruh workbook sebagai objek Python
+    sebelum jadi DataFrame; Parquet dibaca kolumnar dan typed. Konversi
+    sekali, run berikutnya load-nya sub-detik. `usecols` membatasi parse
+    hanya ke kolom yang benar-benar dipakai.
+    """
+    pq = path + ".parquet"
+    if os.path.exists(pq) and os.path.getmtime(pq) > os.path.getmtime(path):
+        try:
+            cols = usecols
+            if cols is not None and pa_parquet is not None:
+                # Sidecar bisa sah ditulis tanpa kolom opsional (mis.
+                # Region): intersect dengan skemanya supaya cache tetap
+                # kepakai, jangan dianggap miss tiap run
+                names = pa_parquet.read_schema(pq).names
+                cols = [c for c in cols if c in names]
+            return pd.read_parquet(pq, columns=cols)
+        except Exception:
+            pass  # sidecar korup: parse ulang Excel dan tulis ulang
+    if usecols is not None:
+        # Kolom opsional (mis. Region) boleh tidak ada di file:
+        # intersect dulu dengan header supaya read_excel tidak error
+        header = pd.read_excel(path, sheet_name=sheet_name, nrows=0).columns
+        usecols = [c for c in usecols if c in header]
+    df = pd.read_excel(path, sheet_name=sheet_name, usecols=usecols)
+    try:
+        df.to_parquet(pq)
+    except Exception as e:
+        print(f"[WARN] Gagal menulis cache parquet ({e}), lanjut tanpa cache.")
+    return df
 
 def load_data():
     print("[INFO] Load GS + Onboarding data ...")
-    gs = pd.read_excel(GS_PATH, sheet_name=GS_SHEET)
-    ob = pd.read_excel(ONBOARD_PATH)
+    gs = _cached_read(GS_PATH, sheet_name=GS_SHEET, usecols=GS_COLS)
+    ob = _cached_read(ONBOARD_PATH, usecols=ONBOARD_COLS)
     print(f"[INFO] Data GS loaded: {len(gs)} rows")
     print(f"[INFO] Data onboarding loaded: {len(ob)} rows")
     return gs, ob
@@ -95,31 +258,67 @@ def load_data():
 def preprocess_join(gs, ob):
     print("[INFO] Preprocessing & join ...")
 
-    # Pastikan kolom yang digunakan bertipe string
-    gs['app_user_id'] = gs['app_user_id'].astype(str)
-    ob['DEVICE_ID'] = ob['DEVICE_ID'].astype(str)
+    # Dtype string pandas/Arrow, bukan objek str Python per sel:
+    # unique() dan join key di bawah jalan di kernel hash native
+    gs['app_user_id'] = gs['app_user_id'].astype(STR_DTYPE)
+    ob['DEVICE_ID'] = ob['DEVICE_ID'].astype(STR_DTYPE)
 
     # Filter GS hanya kolom yang dibutuhkan
     gs_filtered = gs[['app_user_id', 'reasons_for_detection', 'device', 'os_version']].drop_duplicates()
 
+    # Pre-filter onboarding via kode kategori: membership test jadi compare
+    # integer C-level, bukan alokasi/hash string Python per baris
+    # dropna: dtype string menyimpan sel kosong sebagai <NA>, dan
+    # kategori Categorical tidak boleh null
+    device_ids = pd.Index(gs_filtered['app_user_id'].dropna().unique())
+    codes = pd.Categorical(ob['DEVICE_ID'], categories=device_ids).codes
+    ob = ob[codes >= 0]
+
     # Lakukan join eksplisit (inner) berdasarkan app_user_id == DEVICE_ID
     df = ob.merge(gs_filtered, left_on='DEVICE_ID', right_on='app_user_id', how='inner')
 
     print(f"[INFO] Data join: {len(df)} baris, {df['CIF'].nunique()} CIF unik")
     df = df.fillna("")
+    # Kolom string yang terus di-groupby/nunique/isin -> category:
+    # operasi selanjutnya jalan di int code, bukan hash string Python
+    for col in ('DEVICE_ID', 'CIF'):
+        df[col] = df[col].astype('category')
     return df, gs
 
 def region_mapping(df, cache):
     df['LATITUDE'] = pd.to_numeric(df['LATITUDE'], errors='coerce')
     df['LONGITUDE'] = pd.to_numeric(df['LONGITUDE'], errors='coerce')
-    tqdm.pandas()
-    def _map(row):
-        lat, lon = row['LATITUDE'], row['LONGITUDE']
-        return get_region(lat, lon, cache, delay=0.1)
     print("[INFO] Mapping region (geocode w/ cache)...")
     if 'Region' not in df.columns or df['Region'].isnull().any():
-        df['Region'] = df.progress_apply(_map, axis=1)
-        save_region_cache(cache)
+        # Banyak baris berbagi koordinat yang sama -> geocode cukup per koordinat unik,
+        # bukan per baris (Nominatim tidak punya batch API, dedup key satu-satunya cara).
+        bad = df['LATITUDE'].isna() | df['LONGITUDE'].isna() | (df['LATITUDE'] == 0) | (df['LONGITUDE'] == 0)
+        keys = pd.Series(
+            list(zip(df['LATITUDE'].round(CACHE_DEC), df['LONGITUDE'].round(CACHE_DEC))),
+            index=df.index
+        )
+        uniq = keys[~bad].drop_duplicates()
+        todo = [k for k in uniq if k not in cache]
+        print(f"[INFO] {len(df)} baris -> {uniq.size} koordinat unik ({len(todo)} belum ter-cache)")
+        if todo and HAS_AIOHTTP:
+            # Satu event loop memultiplex semua request HTTP, tanpa
+            # stack thread per koneksi; semaphore + rate limiter tetap
+            # menjaga batas request Nominatim
+            cache.put_many(asyncio.run(_geocode_async(todo)).items())
+        else:
+            pending = {}
+            with ThreadPoolExecutor(max_workers=GEOCODE_WORKERS) as ex:
+                futures = {ex.submit(get_region, lat, lon): (lat, lon) for lat, lon in todo}
+                for fut in tqdm(as_completed(futures), total=len(futures)):
+                    pending[futures[fut]] = fut.result()
+                    if len(pending) >= 100:  # flush per batch dalam satu transaksi
+                        cache.put_many(pending.items())
+                        pending.clear()
+            if pending:
+                cache.put_many(pending.items())
+        lookup = {k: cache.get(k) for k in uniq}
+        df['Region'] = np.where(bad, "Unknown", keys.map(lookup).fillna("Unknown"))
+    df['Region'] = df['Region'].astype('category')
     return df
 
 def audit_flag(row):
@@ -150,7 +349,7 @@ def grid_aggregate(df, gs):
     gs_sub.columns = ['DEVICE_ID', 'Device_Model', 'OS', 'Reasons']
     df = pd.merge(df, gs_sub, how='left', left_on='DEVICE_ID', right_on='DEVICE_ID')
 
-    agg = df.groupby(['GRID_ID', 'GRID_LAT', 'GRID_LON', 'Region']).agg(
+    agg = df.groupby(['GRID_ID', 'GRID_LAT', 'GRID_LON', 'Region'], observed=True).agg(
         Risk_Score=('CIF', 'count'),
         Customer_Count=('CIF', pd.Series.nunique),
         Device_Count=('DEVICE_ID', pd.Series.nunique),
@@ -191,6 +390,107 @@ def grid_aggregate(df, gs):
     """, axis=1)
     return agg, df
 
+# Index 0 = Unknown, selebihnya sejalan dengan Risk_Score 1-4
+RISK_LABELS = np.array(['Unknown', 'Low', 'Medium', 'High', 'Critical'])
+
+if HAS_NUMBA:
+    @njit(parallel=True, cache=True)
+    def _classify(months, devices):
+        score = np.zeros(months.shape[0], dtype=np.int64)
+        for i in prange(months.shape[0]):
+            m, d = months[i], devices[i]
+            if m == 1 and d == 1:
+                score[i] = 1
+            elif m > 1 and d == 1:
+                score[i] = 2
+            elif m == 1 and d > 1:
+                score[i] = 3
+            elif m > 1 and d > 1:
+                score[i] = 4
+        return score
+else:
+    def _classify(months, devices):
+        conditions = [
+            (months == 1) & (devices == 1),
+            (months > 1) & (devices == 1),
+            (months == 1) & (devices > 1),
+            (months > 1) & (devices > 1),
+        ]
+        return np.select(conditions, [1, 2, 3, 4], default=0)
+
+def _month_label(idx):
+    # Index bulan int (tahun*12 + bulan) -> 'YYYY-MM' untuk display/export
+    if pd.isna(idx):
+        return "Unknown"
+    return f"{(int(idx) - 1) // 12}-{(int(idx) - 1) % 12 + 1:02d}"
+
+def compute_risk_scoring(df):
+    print("[INFO] Risk scoring per CIF ...")
+    df['CREATED_TIME'] = pd.to_datetime(df['CREATED_TIME'], errors='coerce')
+    # Index bulan integer, bukan Period: nunique/groupby/min jalan di hash
+    # path C untuk int, tanpa objek Period per baris
+    ct = df['CREATED_TIME']
+    df['BULAN_TAHUN'] = (ct.dt.year * 12 + ct.dt.month).astype('Int32')
+
+    # Satu agg C-level per CIF, bukan loop Python per group. Cohort cukup
+    # dihitung di frame kecil hasil agg, tanpa transform sepanjang df.
+    agg = df.groupby('CIF', observed=True).agg(
+        Months=('BULAN_TAHUN', 'nunique'),
+        Devices=('DEVICE_ID', 'nunique'),
+        Cohort=('BULAN_TAHUN', 'min'),
+    )
+    # Region dominan per CIF lewat satu pass counting, tanpa mode()
+    # yang sort seluruh nilai per group
+    counts = (
+        df.dropna(subset=['Region'])
+        .groupby(['CIF', 'Region'], observed=True).size().reset_index(name='n')
+    )
+    top_region = (
+        counts.sort_values(['CIF', 'n'])
+        .drop_duplicates('CIF', keep='last')
+        .set_index('CIF')['Region']
+        .astype(object)  # lepas dari dtype category supaya fillna bebas
+    )
+    agg['Region'] = top_region.reindex(agg.index).fillna('Unknown')
+
+    score = _classify(
+        agg['Months'].to_numpy(dtype=np.int64),
+        agg['Devices'].to_numpy(dtype=np.int64),
+    )
+    agg['Risk_Score'] = score
+    agg['Risk_Label'] = np.take(RISK_LABELS, score)
+    df_risk = agg.reset_index()
+
+    # Ringkasan untuk chart diturunkan langsung dari frame agg yang sama,
+    # supaya fungsi viz tidak groupby ulang di frame besar
+    cohort_summary = (
+        df_risk.groupby(df_risk['Cohort'].map(_month_label))['CIF']
+        .count().sort_index()
+    )
+    region_stats = df_risk.groupby('Region')['Risk_Score'].agg(['sum', 'mean'])
+    return df_risk, cohort_summary, region_stats
+
+def cohort_analysis(cohort_summary, out_path=OUT_CHART_COHORT):
+    print("[INFO] Cohort analysis ...")
+    ax = cohort_summary.plot(kind='bar', figsize=(10, 5), title='Jumlah CIF per Cohort')
+    ax.set_xlabel('Cohort')
+    ax.set_ylabel('Jumlah CIF')
+    plt.tight_layout()
+    plt.savefig(out_path, dpi=120)
+    plt.close()
+    print(f"[INFO] Chart cohort disimpan ke {out_path}")
+
+def visualize_risk_region(region_stats, out_path=OUT_CHART_REGION):
+    print("[INFO] Visualisasi risk per region ...")
+    risk_region = region_stats['sum'].sort_values(ascending=False).head(20)
+    ax = risk_region.plot(kind='bar', figsize=(10, 5), title='Total Risk Score per Region')
+    ax.set_xlabel('Region')
+    ax.set_ylabel('Total Risk Score')
+    plt.tight_layout()
+    plt.savefig(out_path, dpi=120)
+    plt.close()
+    print(f"[INFO] Chart risk region disimpan ke {out_path}")
+
 def plot_point_precision(df, m):
     print("[INFO] Plotting individual customer/device points ...")
     for _, row in df.iterrows():
@@ -248,19 +548,56 @@ def plot_map(agg, df):
     m.save(OUT_MAP)
     print(f"[INFO] Map risk grid berhasil disimpan ke {OUT_MAP}")
 
+def export_heatmap(df, out_path=OUT_HEATMAP):
+    print("[INFO] Export heatmap ...")
+    df_heat = df[['LATITUDE', 'LONGITUDE']].dropna()
+    df_heat = df_heat[(df_heat['LATITUDE'] != 0) & (df_heat['LONGITUDE'] != 0)]
+    # Pre-agregasi ke sel grid 0.001 derajat dan kirim [lat, lon, weight]
+    # per sel, bukan semua titik mentah -> HTML kecil, render browser ringan
+    agg = (
+        df_heat.assign(latq=df_heat['LATITUDE'].round(3),
+                       lonq=df_heat['LONGITUDE'].round(3))
+        .groupby(['latq', 'lonq']).size().reset_index(name='w')
+    )
+    points = agg[['latq', 'lonq', 'w']].values.tolist()
+    m = folium.Map(location=[-2.5, 118.0], zoom_start=5,
+                   tiles='OpenStreetMap', prefer_canvas=True)
+    HeatMap(points, radius=12, blur=18, name="Heatmap").add_to(m)
+    # Layer alternatif: clustering di sisi client, hanya cluster yang
+    # terlihat di viewport yang dirender — tetap responsif di puluhan
+    # ribu titik mentah
+    FastMarkerCluster(
+        df_heat[['LATITUDE', 'LONGITUDE']].values.tolist(),
+        name="Cluster Titik"
+    ).add_to(m)
+    folium.LayerControl(collapsed=False).add_to(m)
+    m.save(out_path)
+    print(f"[INFO] Heatmap ({len(points)} sel dari {len(df_heat)} titik) disimpan ke {out_path}")
+
+def _export_excel(df, path):
+    # xlsxwriter jauh lebih hemat memori daripada openpyxl untuk menulis.
+    # Catatan: jangan pakai constant_memory di sini — pandas menulis
+    # kolom per kolom, sedangkan mode itu membuang baris yang sudah
+    # dilewati penulisnya, jadi hasilnya korup.
+    with pd.ExcelWriter(path, engine='xlsxwriter') as writer:
+        df.to_excel(writer, index=False)
+
 def main():
     print("=== RISK GRID PIPELINE v5.1 ===")
     gs, ob = load_data()
     df, gs = preprocess_join(gs, ob)
-    cache = load_region_cache()
+    cache = RegionCache()
     df = region_mapping(df, cache)
     df = assign_geohash_id(df)
     agg, df_full = grid_aggregate(df, gs)
+    df_risk, cohort_summary, region_stats = compute_risk_scoring(df_full)
     # --- Simpan hasil ke file untuk dashboard ---
-    agg.to_excel(OUT_GRID, index=False)
-    df_full.to_excel(OUT_DETAIL, index=False)
+    _export_excel(agg, OUT_GRID)
+    _export_excel(df_full.drop(columns=['BULAN_TAHUN']), OUT_DETAIL)
+    _export_excel(df_risk.assign(Cohort=df_risk['Cohort'].map(_month_label)), OUT_RISK)
     print(f"[INFO] Hasil grid summary disimpan ke {OUT_GRID}")
     print(f"[INFO] Hasil detail device-nasabah disimpan ke {OUT_DETAIL}")
+    print(f"[INFO] Hasil risk scoring per CIF disimpan ke {OUT_RISK}")
     # --- Summary ---
     print("="*50)
     print(f"Total nasabah terdeteksi: {df['CIF'].nunique()}")
@@ -270,6 +607,9 @@ def main():
     print(agg.sort_values("Risk_Score", ascending=False).head(10)[['GRID_ID', 'Risk_Score', 'Customer_Count', 'GRID_LAT', 'GRID_LON', 'Region', 'HIGH_RISK']])
     print("="*50)
     plot_map(agg, df_full)
+    export_heatmap(df_full)
+    cohort_analysis(cohort_summary)
+    visualize_risk_region(region_stats)
     print("Pipeline join + scoring + grid mapping selesai! 🚦")
 
 if __name__ == "__main__":